@@ -2,6 +2,8 @@ import os.path
 import tornado.web
 import tornado.ioloop
 from term1nal.conf import conf
+from term1nal.assets import PrecompressedStaticFileHandler
+from term1nal.executor import EXECUTOR
 from term1nal.handlers import IndexHandler, WSHandler, UploadHandler, DownloadHandler
 from term1nal.utils import get_ssl_context
 
@@ -21,6 +23,7 @@ class Term1nal(tornado.web.Application):
         settings = dict(
             websocket_ping_interval=conf.ws_ping,
             debug=conf.debug,
+            static_handler_class=PrecompressedStaticFileHandler,
             xsrf_cookies=conf.xsrf,
             origin_policy=conf.origin,
             cookie_secret="_Valar_Morghulis_Valar_Dohaeris_"
@@ -40,6 +43,8 @@ def main():
         xheaders=True,
         max_body_size=6000 * 1024 * 1024,  # 6G
     )
+    if conf.metrics_interval:
+        tornado.ioloop.PeriodicCallback(EXECUTOR.log_metrics, conf.metrics_interval * 1000).start()
     app.listen(conf.port, conf.address, **server_settings)
     if ssl_ctx:
         server_settings.update(ssl_options=ssl_ctx)
@@ -0,0 +1,140 @@
+import os
+import gzip
+import os.path
+import mimetypes
+import tornado.web
+
+from term1nal.utils import LOG
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Precompressed variants, in order of preference: (Content-Encoding, file suffix)
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE = (".js", ".css", ".html", ".svg", ".ttf", ".json")
+ONE_YEAR = 365 * 24 * 60 * 60
+
+
+def compress_file(path):
+    """
+    Write gzip(and brotli, if available) variants next to a static file,
+    skipping variants which are already newer than the source file.
+
+    :param path: Path of the static file
+    :return: List of paths written
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    compressors = [(".gz", lambda d: gzip.compress(d, compresslevel=9))]
+    if brotli:
+        compressors.append((".br", lambda d: brotli.compress(d, quality=11)))
+
+    written = []
+    mtime = os.path.getmtime(path)
+    for suffix, compress in compressors:
+        target = path + suffix
+        if os.path.isfile(target) and os.path.getmtime(target) >= mtime:
+            continue
+        compressed = compress(data)
+        # Not worth serving a variant which is not smaller
+        if len(compressed) >= len(data):
+            continue
+        with open(target, "wb") as f:
+            f.write(compressed)
+        written.append(target)
+    return written
+
+
+def build_assets(static_path):
+    """
+    Precompress every compressible file under static_path
+
+    :param static_path: Root directory of static files
+    :return: List of paths written
+    """
+    if not brotli:
+        LOG.warning("brotli is not installed, only gzip variants will be built")
+
+    written = []
+    for root, _, files in os.walk(static_path):
+        for name in files:
+            if name.endswith(COMPRESSIBLE):
+                written.extend(compress_file(os.path.join(root, name)))
+    return written
+
+
+class PrecompressedStaticFileHandler(tornado.web.StaticFileHandler):
+    """
+    StaticFileHandler which serves precompressed(.br/.gz) variants built by
+    build_assets() when the client accepts them, and marks fingerprinted
+    requests(static_url() with ?v=<hash>) as immutable.
+    """
+    content_encoding = None
+    original_path = None
+    cache_time = 0
+
+    def _accepted_encodings(self):
+        """
+        Return the precompressed encodings the client accepts, honouring
+        q=0 and the "*" wildcard
+
+        :return: Set of Content-Encoding values
+        """
+        accept = self.request.headers.get("Accept-Encoding", "")
+        qvalues = {}
+        for item in accept.split(","):
+            coding, _, params = item.strip().partition(";")
+            if not coding:
+                continue
+            name, _, value = params.partition("=")
+            try:
+                q = float(value) if name.strip() == "q" else 1.0
+            except ValueError:
+                q = 0.0
+            qvalues[coding.strip().lower()] = q
+
+        wildcard = qvalues.get("*", 0.0)
+        return {encoding for encoding, _ in ENCODINGS if qvalues.get(encoding, wildcard) > 0}
+
+    def validate_absolute_path(self, root, absolute_path):
+        absolute_path = super().validate_absolute_path(root, absolute_path)
+        if absolute_path is None or not absolute_path.endswith(COMPRESSIBLE):
+            return absolute_path
+
+        self.original_path = absolute_path
+        accepted = self._accepted_encodings()
+        mtime = os.path.getmtime(absolute_path)
+        for encoding, suffix in ENCODINGS:
+            variant = absolute_path + suffix
+            if encoding in accepted and os.path.isfile(variant) and os.path.getmtime(variant) >= mtime:
+                self.content_encoding = encoding
+                return variant
+        return absolute_path
+
+    def get_content_type(self):
+        if not self.content_encoding:
+            return super().get_content_type()
+        mime_type, _ = mimetypes.guess_type(self.original_path)
+        return mime_type or "application/octet-stream"
+
+    def get_cache_time(self, path, modified, mime_type):
+        # Fingerprinted requests, Expires and Cache-Control both derive from this value
+        self.cache_time = ONE_YEAR if "v" in self.request.arguments else 0
+        return self.cache_time
+
+    def set_extra_headers(self, path):
+        if path.endswith(COMPRESSIBLE):
+            self.set_header("Vary", "Accept-Encoding")
+        if self.content_encoding:
+            self.set_header("Content-Encoding", self.content_encoding)
+        if self.cache_time:
+            self.set_header("Cache-Control", f"public, max-age={self.cache_time}, immutable")
+
+
+if __name__ == "__main__":
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for p in build_assets(os.path.join(base_dir, "static")):
+        LOG.info(f"Built {p}")
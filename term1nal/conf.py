@@ -1,5 +1,6 @@
 import os
 import os.path
+from tornado.process import cpu_count
 
 
 def get_bool_env(name, default=False) -> bool:
@@ -57,4 +58,8 @@ conf.timeout = int(os.getenv("TERM_TIMEOUT", 3))
 conf.max_conn = int(os.getenv("TERM_MAX_CONN", 20))
 conf.delay = int(os.getenv("TERM_MAX_CONN", 0))
 conf.encoding = os.getenv("TERM_ENCODING", "")
-
+conf.workers = int(os.getenv("TERM_WORKERS", cpu_count() * 5))
+conf.queue_size = int(os.getenv("TERM_QUEUE_SIZE", 100))
+conf.host_conn = int(os.getenv("TERM_HOST_CONN", 10))
+conf.retry_after = int(os.getenv("TERM_RETRY_AFTER", 5))
+conf.metrics_interval = int(os.getenv("TERM_METRICS_INTERVAL", 60))
@@ -0,0 +1,156 @@
+import time
+import asyncio
+import bisect
+import itertools
+import tornado.web
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from term1nal.conf import conf
+from term1nal.utils import LOG
+
+# Lower value runs first
+INTERACTIVE = 0
+BULK = 10
+
+
+class Saturated(tornado.web.HTTPError):
+    """ Raised when the admission queue is full, rendered as 503 with Retry-After """
+
+    def __init__(self, retry_after):
+        super().__init__(503, 'Server is busy, please retry later')
+        self.retry_after = retry_after
+
+
+class Executor:
+    """
+    Shared worker pool for blocking paramiko operations.
+
+    Jobs wait in a bounded queue ordered by (priority, arrival) and are
+    granted a slot when a worker is free and their target host is under its
+    concurrency cap. Short jobs use submit(), transfers hold a slot with
+    acquire()/release() and run each blocking step with run().
+    All bookkeeping happens on the IOLoop thread.
+    """
+
+    def __init__(self, max_workers, queue_size, host_conn, retry_after):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.host_conn = host_conn
+        self.retry_after = retry_after
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='term1nal')
+        self.queue = []
+        self.seq = itertools.count()
+        self.running = 0
+        self.host_running = Counter()
+        self.stats = dict(submitted=0, rejected=0, dispatched=0, completed=0, wait_total=0.0, wait_max=0.0)
+
+    def saturated(self, priority=INTERACTIVE):
+        """ Return True if a new job of this priority could neither run now nor be queued """
+        if self.running < self.max_workers or len(self.queue) < self.queue_size:
+            return False
+        # A full queue still admits the job if it can evict a lower priority one
+        return not self.queue or self.queue[-1][0] <= priority
+
+    def check_admission(self, priority=INTERACTIVE):
+        """ Raise Saturated early, e.g. before reading a request body """
+        if self.saturated(priority):
+            self._reject()
+
+    async def acquire(self, host=None, priority=INTERACTIVE):
+        """
+        Wait for a worker slot, the slot is held until release() is called
+
+        :param host: Target host, used for the per-host concurrency cap
+        :param priority: INTERACTIVE or BULK
+        :return: None
+        """
+        future = asyncio.get_event_loop().create_future()
+        entry = (priority, next(self.seq), (host, future, time.monotonic()))
+        bisect.insort(self.queue, entry)
+        self._dispatch()
+
+        # Only jobs which could not be dispatched right away are rejected,
+        # the newest job of the lowest priority goes first
+        if len(self.queue) > self.queue_size:
+            victim = self.queue.pop()
+            if victim is entry:
+                self._reject()
+            victim[2][1].set_exception(Saturated(self.retry_after))
+            self.stats['rejected'] += 1
+
+        self.stats['submitted'] += 1
+        await future
+
+    def release(self, host=None):
+        """ Give back a slot taken by acquire() and dispatch waiting jobs """
+        self.running -= 1
+        self.stats['completed'] += 1
+        if host is not None:
+            self.host_running[host] -= 1
+            if not self.host_running[host]:
+                del self.host_running[host]
+        self._dispatch()
+
+    def run(self, func, *args):
+        """ Run func(*args) in the worker pool, the caller must hold a slot """
+        return asyncio.get_event_loop().run_in_executor(self.pool, func, *args)
+
+    async def submit(self, func, *args, host=None, priority=INTERACTIVE):
+        """
+        Run func(*args) in the worker pool once admitted
+
+        :param func: Blocking callable
+        :param host: Target host, used for the per-host concurrency cap
+        :param priority: INTERACTIVE or BULK
+        :return: Result of func
+        """
+        await self.acquire(host, priority)
+        try:
+            return await self.run(func, *args)
+        finally:
+            self.release(host)
+
+    def _reject(self):
+        self.stats['rejected'] += 1
+        LOG.debug(f'Executor saturated, rejecting job: {self.metrics()}')
+        raise Saturated(self.retry_after)
+
+    def _dispatch(self):
+        index = 0
+        while self.running < self.max_workers and index < len(self.queue):
+            host, future, enqueued = self.queue[index][2]
+            if host is not None and self.host_running[host] >= self.host_conn:
+                # Skip to the next job, this host is busy
+                index += 1
+                continue
+
+            self.queue.pop(index)
+            self._record_wait(time.monotonic() - enqueued)
+            self.running += 1
+            if host is not None:
+                self.host_running[host] += 1
+            future.set_result(None)
+
+    def _record_wait(self, wait):
+        self.stats['dispatched'] += 1
+        self.stats['wait_total'] += wait
+        self.stats['wait_max'] = max(self.stats['wait_max'], wait)
+        LOG.debug(f'Job waited {wait:.3f}s in queue, {len(self.queue)} queued, {self.running} running')
+
+    def metrics(self):
+        """ Return a snapshot of queue and wait-time metrics since the last log_metrics() """
+        dispatched = self.stats['dispatched']
+        return dict(
+            self.stats,
+            queued=len(self.queue),
+            running=self.running,
+            wait_avg=self.stats['wait_total'] / dispatched if dispatched else 0.0,
+        )
+
+    def log_metrics(self):
+        """ Log metrics and start a new interval """
+        LOG.info(f'Executor metrics: {self.metrics()}')
+        self.stats.update(submitted=0, rejected=0, dispatched=0, completed=0, wait_total=0.0, wait_max=0.0)
+
+EXECUTOR = Executor(conf.workers, conf.queue_size, conf.host_conn, conf.retry_after)
@@ -1,4 +1,5 @@
 import re
+import sys
 import json
 import socket
 import struct
@@ -9,11 +10,10 @@ import tornado.web
 from json.decoder import JSONDecodeError
 from tornado import iostream
 from tornado.ioloop import IOLoop
-from concurrent.futures import ThreadPoolExecutor
-from tornado.process import cpu_count
 
 from term1nal.conf import conf
 from term1nal.minion import Minion, recycle_minion, GRU
+from term1nal.executor import EXECUTOR, BULK, Saturated
 from term1nal.utils import LOG
 
 DELAY = 3
@@ -30,6 +30,8 @@ class CommonMixin:
     ssh_transport_client = None
     minion_id = None
     filename = ''
+    slot_host = None
+    has_slot = False
 
     def initialize(self, loop):
         self.context = self.request.connection.context
@@ -47,18 +49,15 @@ class CommonMixin:
             raise ValueError('Authentication failed.')
         return ssh
 
-    def exec_remote_cmd(self, cmd, probe_cmd=None):
+    def exec_remote_cmd(self, args, cmd, probe_cmd=None):
         """
         Execute command(cmd or probe-command) on remote host
 
+        :param args: SSH arguments from get_minion_args()
         :param cmd: Command to execute
         :param probe_cmd: Probe command to execute before 'cmd'
         :return: None
         """
-        client_ip = self.get_client_endpoint()[0]
-        gru = GRU.get(client_ip, {})
-        args = gru[self.minion_id]["args"]
-
         self.ssh_transport_client = self.create_ssh_client(args)
 
         # Use probe_cmd to detect file's existence
@@ -73,6 +72,50 @@ class CommonMixin:
         self.fh = transport.open_channel(kind='session')
         self.fh.exec_command(cmd)
 
+    def get_minion_args(self):
+        """
+        Return SSH arguments of current minion
+
+        :return: (hostname, port, username, password) tuple
+        """
+        client_ip = self.get_client_endpoint()[0]
+        gru = GRU.get(client_ip, {})
+        return gru[self.minion_id]["args"]
+
+    async def acquire_slot(self, host, priority):
+        """
+        Hold an executor slot for a whole transfer, released by release_slot()
+
+        :param host: Target host
+        :param priority: Executor priority
+        :return: None
+        """
+        await EXECUTOR.acquire(host, priority)
+        self.slot_host = host
+        self.has_slot = True
+
+    def release_slot(self):
+        if self.has_slot:
+            self.has_slot = False
+            EXECUTOR.release(self.slot_host)
+
+    def on_finish(self):
+        self.release_slot()
+        super(CommonMixin, self).on_finish()
+
+    def on_connection_close(self):
+        # Unblock a pending recv/sendall of an interrupted transfer
+        if self.has_slot and self.ssh_transport_client:
+            self.ssh_transport_client.close()
+        self.release_slot()
+        super(CommonMixin, self).on_connection_close()
+
+    def write_error(self, status_code, **kwargs):
+        exc_info = kwargs.get('exc_info')
+        if exc_info and isinstance(exc_info[1], Saturated):
+            self.set_header('Retry-After', exc_info[1].retry_after)
+        super(CommonMixin, self).write_error(status_code, **kwargs)
+
     def get_value(self, name, type=""):
 
         if type == "query":
@@ -105,6 +148,7 @@ class CommonMixin:
 class StreamUploadMixin(CommonMixin):
     content_type = None
     boundary = None
+    rejected = None
 
     def _get_boundary(self):
         """
@@ -119,9 +163,9 @@ class StreamUploadMixin(CommonMixin):
         else:
             return None
 
-    def _write_chunk(self, chunk):
+    async def _write_chunk(self, chunk):
         trimmed_chunk = self._filter_trailing_carriage_return(chunk)
-        self.fh.sendall(trimmed_chunk)
+        await EXECUTOR.run(self.fh.sendall, trimmed_chunk)
 
     @staticmethod
     def _filter_trailing_carriage_return(chunk):
@@ -138,12 +182,16 @@ class StreamUploadMixin(CommonMixin):
             return data
         return chunk
 
-    def data_received(self, data):
+    async def data_received(self, data):
         """
 
         :param data:
         :return: None
         """
+        # Admission was rejected, the 503 has been sent already
+        if self.rejected:
+            return
+
         if not self.boundary:
             self.boundary = self._get_boundary()
 
@@ -161,6 +209,7 @@ class StreamUploadMixin(CommonMixin):
             elif chunk_length == 4:
                 # End, close file handler(or similar object)
                 self.ssh_transport_client.close()
+                self.release_slot()
             else:
                 need2partition = re.match('.*Content-Disposition:\sform-data;.*', chunk.decode('ISO-8859-1'),
                                           re.DOTALL | re.MULTILINE)
@@ -179,15 +228,25 @@ class StreamUploadMixin(CommonMixin):
                                 self.filename = 'untitled'
 
                             self.filename = re.sub('\s+', '_', self.filename)
+                            args = self.get_minion_args()
+                            try:
+                                await self.acquire_slot(args[0], BULK)
+                            except Saturated as err:
+                                # Reply now, tornado closes the connection instead of reading the rest
+                                self.rejected = err
+                                self.send_error(503, exc_info=sys.exc_info())
+                                return
                             # A trick to create a remote file handler
-                            self.exec_remote_cmd(f'cat > /tmp/{self.filename}')
-                            self._write_chunk(part)
+                            await EXECUTOR.run(self.exec_remote_cmd, args, f'cat > /tmp/{self.filename}')
+                            await self._write_chunk(part)
                 else:
-                    self._write_chunk(chunk)
+                    await self._write_chunk(chunk)
 
 
 class IndexHandler(CommonMixin, tornado.web.RequestHandler):
-    executor = ThreadPoolExecutor(max_workers=cpu_count() * 5)
+    # Rendered index page, only cached in production mode without XSRF,
+    # the XSRF field(rendered only when xsrf_cookies is on) is per client
+    index_page = None
 
     def initialize(self, loop):
         print("indexhandler init")
@@ -219,12 +278,12 @@ class IndexHandler(CommonMixin, tornado.web.RequestHandler):
         LOG.warning('!!! Unable to detect default encoding')
         return 'utf-8'
 
-    def create_minion(self, args):
+    def create_minion(self, args, term):
+        self.ssh_term_client = self.create_ssh_client(args)
         ssh = self.ssh_term_client
         ssh_endpoint = args[:2]
         LOG.info('Connecting to {}:{}'.format(*ssh_endpoint))
 
-        term = self.get_argument('term', '') or 'xterm'
         shell_channel = ssh.invoke_shell(term=term)
         shell_channel.setblocking(0)
         minion = Minion(self.loop, ssh, shell_channel, ssh_endpoint)
@@ -232,7 +291,13 @@ class IndexHandler(CommonMixin, tornado.web.RequestHandler):
         return minion
 
     def get(self):
-        self.render('index.html', debug=self.debug)
+        if self.debug or self.settings.get('xsrf_cookies'):
+            self.render('index.html', debug=self.debug)
+            return
+
+        if IndexHandler.index_page is None:
+            IndexHandler.index_page = self.render_string('index.html', debug=self.debug)
+        self.finish(IndexHandler.index_page)
 
     @tornado.gen.coroutine
     def post(self):
@@ -243,9 +308,8 @@ class IndexHandler(CommonMixin, tornado.web.RequestHandler):
 
         try:
             args = self.get_args()
-            self.ssh_term_client = self.create_ssh_client(args)
-            future = self.executor.submit(self.create_minion, args)
-            minion = yield future
+            term = self.get_argument('term', '') or 'xterm'
+            minion = yield EXECUTOR.submit(self.create_minion, args, term, host=args[0])
         except InvalidValueError as err:
             # Catch error in self.get_args()
             raise tornado.web.HTTPError(400, str(err))
@@ -336,7 +400,13 @@ class UploadHandler(StreamUploadMixin, CommonMixin, tornado.web.RequestHandler):
     def initialize(self, loop):
         super(UploadHandler, self).initialize(loop=loop)
 
+    def prepare(self):
+        # Turn uploads away before any of the body is read
+        EXECUTOR.check_admission(BULK)
+
     async def post(self):
+        if self.rejected:
+            return
         print("upload ended")
         await self.finish(f'/tmp/{self.filename}')  # Send filename back
 
@@ -353,22 +423,23 @@ class DownloadHandler(CommonMixin, tornado.web.RequestHandler):
         print(remote_file_path)
         self.minion_id = self.get_value("minion")
         print(f"minion ID: {self.minion_id}")
-        client_ip = self.get_client_endpoint()[0]
-        gru = GRU.get(client_ip, {})
-        self.args = gru[self.minion_id]["args"]
+        args = self.get_minion_args()
 
+        # The slot is held for the whole transfer, released in on_finish()
+        await self.acquire_slot(args[0], BULK)
         try:
-            self.exec_remote_cmd(cmd=f'cat {remote_file_path}', probe_cmd=f'ls {remote_file_path}')
+            await EXECUTOR.run(self.exec_remote_cmd, args, f'cat {remote_file_path}', f'ls {remote_file_path}')
         except tornado.web.HTTPError:
             self.write(f'Not found: {remote_file_path}')
             await self.finish()
+            return
 
         self.set_header("Content-Type", "application/octet-stream")
         self.set_header("Accept-Ranges", "bytes")
         self.set_header("Content-Disposition", f"attachment; filename={filename}")
 
         while True:
-            chunk = self.fh.recv(chunk_size)
+            chunk = await EXECUTOR.run(self.fh.recv, chunk_size)
             if not chunk:
                 break
             try:
@@ -3,8 +3,6 @@ import ssl
 import paramiko
 import logging
 import socket
-import asyncio
-import concurrent.futures
 from paramiko.ssh_exception import AuthenticationException, SSHException
 from tornado.log import enable_pretty_logging
 
@@ -71,9 +69,3 @@ def get_sftp_client(*args):
     except (AuthenticationException, SSHException, socket.error) as err:
         print(err)
 
-
-async def run_async_func(func, *args):
-    loop = asyncio.get_running_loop()
-    with concurrent.futures.ThreadPoolExecutor() as pool:
-        result = await loop.run_in_executor(pool, func, *args)
-        return result